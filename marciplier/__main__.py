@@ -0,0 +1,30 @@
+import argparse
+import json
+
+from marciplier.profiling import profile
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="marciplier")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    profile_parser = subparsers.add_parser(
+        "profile", help="Show tag, subfield, indicator and leader statistics of a MARCXML file."
+    )
+    profile_parser.add_argument("path", help="Path to the MARCXML file.")
+    profile_parser.add_argument(
+        "--workers", type=int, default=None, help="Number of worker processes. Defaults to the number of CPUs."
+    )
+    profile_parser.add_argument("--json", action="store_true", help="Print the statistics as JSON.")
+
+    args = parser.parse_args()
+    if args.command == "profile":
+        dump_profile = profile(args.path, workers=args.workers)
+        if args.json:
+            print(json.dumps(dump_profile.to_dict(), indent=4, ensure_ascii=False))
+        else:
+            print(dump_profile)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,73 @@
-from typing import Sequence
+import io
+import json
+from typing import IO, Iterable, Sequence
 from marciplier.marc_record import ControlField, DataField, Leader, MarcRecord
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def encoder():
+    """Returns a function that encodes an object to compact UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps
+    encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+    return lambda obj: encode(obj).encode("utf-8")
+
+
+def write_json(
+    records: Iterable[MarcRecord],
+    fp: IO,
+    ndjson: bool = False,
+    buffer_size: int = 1 << 20,
+) -> int:
+    """
+    Writes records to a file as they arrive, without building the whole document first.
+
+    Uses orjson when it is installed and the standard library otherwise. Both backends
+    produce the same compact output.
+
+    Args:
+        records: Any iterable of MarcRecords, e.g. `MarcXmlConversionStrategy().iter_records(src)`.
+        fp: A file object opened in text or binary mode.
+        ndjson: Optional; write one record per line instead of a single JSON array.
+        buffer_size: Optional; number of bytes to collect before each write.
+
+    Returns:
+        The number of records written.
+    """
+    encode = encoder()
+    binary = not isinstance(fp, io.TextIOBase)
+    separator = b"\n" if ndjson else b","
+
+    def flush(chunks: list[bytes]) -> None:
+        data = b"".join(chunks)
+        fp.write(data if binary else data.decode("utf-8"))
+        chunks.clear()
+
+    chunks = [] if ndjson else [b"["]
+    size = 0
+    count = 0
+    for record in records:
+        if count and not ndjson:
+            chunks.append(separator)
+        chunk = encode(record.to_dict())
+        chunks.append(chunk)
+        if ndjson:
+            chunks.append(separator)
+        count += 1
+        size += len(chunk)
+        if size >= buffer_size:
+            flush(chunks)
+            size = 0
+
+    if not ndjson:
+        chunks.append(b"]")
+    flush(chunks)
+    return count
+
 
 class MarcJsonConversionStrategy:
     def to_records(self, src: Sequence[dict]) -> list[MarcRecord]:
@@ -191,14 +191,14 @@ class MarcXmlHandler(xml.sax.handler.ContentHandler):
         Args:
             content: Character data to process.
         """
-        if content.strip():
-            if self.current_line_count > 0:
-                # Append content to the existing text for multi-line elements
-                self.marc_xml_state.current_text += content
-            else:
-                self.current_line_count += 1
-                # Set the text content for single-line elements
-                self.marc_xml_state.current_text = content
+        if self.current_line_count > 0:
+            # Append content to the existing text for multi-line elements. The parser may
+            # split text at any point, so whitespace-only chunks are part of the value too.
+            self.marc_xml_state.current_text += content
+        elif content.strip():
+            self.current_line_count += 1
+            # Set the text content for single-line elements
+            self.marc_xml_state.current_text = content
 
 class MarcXmlConversionStrategy:
     """Handles conversion between MARC XML and internal MARC records."""
@@ -221,6 +221,36 @@ class MarcXmlConversionStrategy:
             pass
         return content_handler.marc_xml_state.records
 
+    def iter_records(self, src, chunk_size=1 << 20):
+        """
+        Parses MARC XML incrementally, yielding records as they are completed.
+
+        Unlike `to_records`, only the records of the current chunk are kept in memory.
+
+        Args:
+            src: Source of the MARC XML (file path or binary file-like object).
+            chunk_size: Number of bytes to feed to the parser at a time.
+
+        Yields:
+            Parsed MarcRecords, in document order.
+        """
+        content_handler = MarcXmlHandler()
+        records = content_handler.marc_xml_state.records
+        parser = xml.sax.make_parser()
+        parser.setContentHandler(content_handler)
+
+        f = src if hasattr(src, "read") else open(src, "rb")
+        try:
+            while chunk := f.read(chunk_size):
+                parser.feed(chunk)
+                yield from records
+                records.clear()
+            parser.close()
+            yield from records
+        finally:
+            if f is not src:
+                f.close()
+
     def from_records(self, src):
         """
         Converts a list of MARC records to MARC XML format.
@@ -2,6 +2,21 @@ import json
 from typing import Any
 
 
+# Fields marked NR in the current MARC 21 Bibliographic format. 250 and 384 are repeatable
+# since 2013 and 2016 respectively.
+NON_REPEATABLE_TAGS = frozenset(
+    (
+        "001", "003", "005", "008",
+        "010", "018", "036", "038", "040", "042", "043", "044", "045", "066",
+        "100", "110", "111", "130",
+        "240", "243", "245", "254", "256", "263",
+        "306", "310", "357",
+        "507", "514",
+        "841", "842", "844", "882",
+    )
+)
+
+
 # Class representing the MARC21 Leader
 class Leader:
     def __init__(self, value: str) -> None:
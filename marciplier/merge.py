@@ -0,0 +1,220 @@
+import os
+import sqlite3
+import tempfile
+from contextlib import ExitStack
+from dataclasses import dataclass
+from typing import Iterator, Literal, Sequence
+
+from marciplier.marc_record import NON_REPEATABLE_TAGS, DataField, MarcRecord
+from marciplier.scanner import iter_fields, iter_record_spans, open_dump, parse_record
+
+
+@dataclass
+class MergePolicy:
+    """Decides how records sharing a key are merged into one."""
+    prefer: Literal["newest", "first", "last"] = "newest" # Which duplicate wins: newest 005, or first/last seen
+    data_fields: Literal["union", "preferred"] = "union" # Union of distinct repeatable data fields, or only the winner's
+
+
+class KeyIndex:
+    """Maps record keys to record locations, spilling to a temporary SQLite file beyond a memory budget."""
+
+    def __init__(self, max_entries: int) -> None:
+        """
+        Args:
+            max_entries: Maximum number of locations to keep in memory before spilling to disk.
+        """
+        self.max_entries = max_entries
+        self.entries: dict[str | int, list[tuple[int, int, int, int]]] = {}
+        self.entry_count = 0
+        self.sequence = 0
+        self.connection: sqlite3.Connection | None = None
+        self.spill_path: str | None = None
+
+    def add(self, key: str | None, location: tuple[int, int, int]) -> None:
+        """
+        Adds the location (source index, offset, length) of a record.
+
+        Records without a key are never merged, so they get their sequence number as a
+        unique integer key, which can't collide with string keys in a dict or in SQLite.
+        """
+        self.sequence += 1
+        if key is None:
+            key = self.sequence
+        self.entries.setdefault(key, []).append((self.sequence, *location))
+        self.entry_count += 1
+        if self.entry_count > self.max_entries:
+            self.spill()
+
+    def spill(self) -> None:
+        """Moves the in-memory locations to disk."""
+        if self.connection is None:
+            fd, self.spill_path = tempfile.mkstemp(suffix=".keys")
+            os.close(fd)
+            self.connection = sqlite3.connect(self.spill_path)
+            self.connection.executescript(
+                """
+                PRAGMA journal_mode = OFF;
+                PRAGMA synchronous = OFF;
+                CREATE TABLE locations (sequence INTEGER PRIMARY KEY, key, source INTEGER, offset INTEGER, length INTEGER);
+                """
+            )
+        self.connection.executemany(
+            "INSERT INTO locations VALUES (?, ?, ?, ?, ?)",
+            (
+                (sequence, key, source, offset, length)
+                for key, locations in self.entries.items()
+                for sequence, source, offset, length in locations
+            ),
+        )
+        self.connection.commit()
+        self.entries.clear()
+        self.entry_count = 0
+
+    def groups(self) -> Iterator[list[tuple[int, int, int]]]:
+        """Yields the locations sharing a key, in order of each key's first appearance."""
+        if self.connection is None:
+            for locations in self.entries.values():
+                yield [location[1:] for location in locations]
+            return
+
+        self.spill()
+        self.connection.execute("CREATE INDEX locations_key ON locations (key, sequence)")
+        keys = self.connection.execute(
+            "SELECT key FROM locations GROUP BY key ORDER BY MIN(sequence)"
+        )
+        for (key,) in keys:
+            yield self.connection.execute(
+                "SELECT source, offset, length FROM locations WHERE key = ? ORDER BY sequence",
+                (key,),
+            ).fetchall()
+
+    def close(self) -> None:
+        if self.connection is not None:
+            self.connection.close()
+            os.remove(self.spill_path)
+            self.connection = None
+
+
+def record_key(record: bytes, key: str) -> str | None:
+    """
+    Reads the merge key of a raw record.
+
+    Args:
+        record: The raw bytes of one record element.
+        key: A control field tag like "001", or a data field subfield like "035$a".
+
+    Returns:
+        The first non-blank value of the key field with surrounding whitespace removed,
+        or None if the record doesn't have one. Records with a blank key are therefore
+        never merged.
+    """
+    tag, _, code = key.partition("$")
+    for field_tag, indicators, content in iter_fields(record):
+        if field_tag != tag:
+            continue
+        if indicators is None:
+            values = [content]
+        else:
+            values = [value for subfield_code, value in content if subfield_code == code]
+        for value in values:
+            value = value.strip()
+            if value:
+                return value
+    return None
+
+
+def data_field_signature(field: DataField) -> tuple:
+    return (
+        field.tag,
+        field.indicators,
+        tuple((subfield.code, tuple(subfield.values)) for subfield in field.subfields),
+    )
+
+
+def merge_group(records: list[MarcRecord], policy: MergePolicy) -> MarcRecord:
+    """
+    Merges records sharing a key according to a policy.
+
+    The preferred record keeps its leader and fields. Control fields it lacks are taken
+    from the other records, and with the "union" policy so are repeatable data fields
+    that are not exact duplicates of ones already present. Non-repeatable data fields,
+    like 100 or 245, only ever come from the preferred record.
+
+    Args:
+        records: The records to merge, in the order they were read.
+        policy: The merge policy.
+
+    Returns:
+        The merged record.
+    """
+    if policy.prefer == "last":
+        records = records[::-1]
+    elif policy.prefer == "newest":
+        def version(record: MarcRecord) -> str:
+            field = record.get_control_field("005")
+            return field.values[0] if field else ""
+
+        records = sorted(records, key=version, reverse=True)
+
+    merged, *others = records
+    signatures = {data_field_signature(field) for field in merged.data_fields}
+    for record in others:
+        for field in record.controlfields:
+            if merged.get_control_field(field.tag) is None:
+                merged.add_field(field)
+        if policy.data_fields == "union":
+            for field in record.data_fields:
+                if field.tag in NON_REPEATABLE_TAGS:
+                    continue
+                signature = data_field_signature(field)
+                if signature not in signatures:
+                    signatures.add(signature)
+                    merged.add_field(field)
+    return merged
+
+
+def merge_records(
+    sources: Sequence[os.PathLike | str],
+    key: str = "001",
+    policy: MergePolicy | None = None,
+    max_keys_in_memory: int = 1_000_000,
+) -> Iterator[MarcRecord]:
+    """
+    Merges records sharing a key across one or more MARC XML files.
+
+    The sources are first scanned to index the location of every record by its key,
+    then each group of duplicates is read back, merged, and yielded. Only the key index
+    is kept in memory, and it spills to disk once it holds more than `max_keys_in_memory`
+    locations.
+
+    Args:
+        sources: Paths to the MARC XML files.
+        key: A control field tag like "001", or a data field subfield like "035$a".
+        policy: Optional; how duplicates are merged. Defaults to `MergePolicy()`.
+        max_keys_in_memory: Optional; number of record locations to keep in memory.
+
+    Yields:
+        The deduplicated records, in order of each key's first appearance. Records
+        without the key are yielded unchanged.
+    """
+    policy = policy or MergePolicy()
+    key_index = KeyIndex(max_keys_in_memory)
+    with ExitStack() as stack:
+        buffers = [stack.enter_context(open_dump(source)) for source in sources]
+        stack.callback(key_index.close)
+
+        for source, buffer in enumerate(buffers):
+            for offset, length in iter_record_spans(buffer):
+                value = record_key(buffer[offset : offset + length], key)
+                key_index.add(value, (source, offset, length))
+
+        for locations in key_index.groups():
+            records = [
+                parse_record(buffers[source][offset : offset + length])
+                for source, offset, length in locations
+            ]
+            if len(records) == 1:
+                yield records[0]
+            else:
+                yield merge_group(records, policy)
@@ -0,0 +1,383 @@
+import html
+import os
+from array import array
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any
+
+from marciplier.scanner import (
+    FIELD_ELEMENT,
+    field_attributes,
+    iter_record_spans,
+    map_shards,
+    open_dump,
+    subfield_code,
+)
+
+
+LENGTH_BUCKETS = 1024 # Value lengths below 1 KiB are counted exactly
+REPEAT_BUCKETS = 64 # Repeat counts below 64 are counted exactly
+OCTAVE_BUCKETS = 8 # Buckets per power of two above the exact range
+MAX_BITS = 32 # Values of 2**32 and above share the last bucket
+LEADER_LENGTH = 24
+
+
+class Histogram:
+    """
+    Array-backed histogram of non-negative integers.
+
+    Values below `exact` get a bucket each. Larger values are counted in log-scale
+    buckets, `OCTAVE_BUCKETS` per power of two, so their percentiles are accurate to
+    within 1/8 of the value.
+    """
+
+    def __init__(self, exact: int) -> None:
+        """
+        Args:
+            exact: Number of values counted exactly. Must be a power of two of at least 8.
+        """
+        self.exact = exact
+        self.exact_bits = exact.bit_length() - 1
+        # One more bucket for values of 2**MAX_BITS and above
+        self.counts = array("Q", bytes(8 * (exact + (MAX_BITS - self.exact_bits) * OCTAVE_BUCKETS + 1)))
+        self.total = 0
+        self.overflow_minimum: int | None = None # Smallest value of `exact` or above
+        self.overflow_maximum = 0 # Largest value of `exact` or above
+
+    def bucket(self, value: int) -> int:
+        if value < self.exact:
+            return value
+        exponent = value.bit_length() - 1
+        if exponent >= MAX_BITS:
+            return len(self.counts) - 1
+        octave = (value >> (exponent - 3)) & (OCTAVE_BUCKETS - 1)
+        return self.exact + (exponent - self.exact_bits) * OCTAVE_BUCKETS + octave
+
+    def bucket_upper_bound(self, bucket: int) -> int:
+        """Returns the largest value that falls into a bucket."""
+        if bucket < self.exact:
+            return bucket
+        if bucket == len(self.counts) - 1:
+            return self.overflow_maximum
+        exponent, octave = divmod(bucket - self.exact, OCTAVE_BUCKETS)
+        exponent += self.exact_bits
+        return (1 << exponent) + ((octave + 1) << (exponent - 3)) - 1
+
+    def add(self, value: int) -> None:
+        if value < self.exact:
+            self.counts[value] += 1
+        else:
+            self.counts[self.bucket(value)] += 1
+            if self.overflow_minimum is None or value < self.overflow_minimum:
+                self.overflow_minimum = value
+            if value > self.overflow_maximum:
+                self.overflow_maximum = value
+        self.total += value
+
+    def merge(self, other: "Histogram") -> None:
+        for i, count in enumerate(other.counts):
+            if count:
+                self.counts[i] += count
+        self.total += other.total
+        if other.overflow_minimum is not None and (
+            self.overflow_minimum is None or other.overflow_minimum < self.overflow_minimum
+        ):
+            self.overflow_minimum = other.overflow_minimum
+        self.overflow_maximum = max(self.overflow_maximum, other.overflow_maximum)
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    @property
+    def minimum(self) -> int | None:
+        for value in range(self.exact):
+            if self.counts[value]:
+                return value
+        return self.overflow_minimum
+
+    @property
+    def maximum(self) -> int:
+        if self.overflow_minimum is not None:
+            return self.overflow_maximum
+        for value in range(self.exact - 1, -1, -1):
+            if self.counts[value]:
+                return value
+        return 0
+
+    def percentile(self, percent: float) -> int:
+        """
+        Returns the smallest value that `percent` percent of the values are less than or equal to.
+
+        Above the exact range this is the upper bound of the percentile's bucket, kept
+        within the smallest and largest value actually seen.
+        """
+        total_count = self.count
+        if not total_count:
+            return 0
+        threshold = total_count * percent / 100
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= threshold:
+                if bucket < self.exact:
+                    return bucket
+                upper_bound = min(self.bucket_upper_bound(bucket), self.overflow_maximum)
+                return max(upper_bound, self.overflow_minimum)
+        return self.maximum
+
+    def to_dict(self) -> dict[str, Any]:
+        total_count = self.count
+        return {
+            "min": self.minimum,
+            "max": self.maximum,
+            "mean": self.total / total_count if total_count else 0,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+        }
+
+
+@dataclass
+class SubfieldStats:
+    """Statistics for one subfield code of a tag."""
+    occurrences: int = 0 # Total number of occurrences
+    repeats: Histogram = field(default_factory=lambda: Histogram(REPEAT_BUCKETS)) # Occurrences per field
+    lengths: Histogram = field(default_factory=lambda: Histogram(LENGTH_BUCKETS)) # Value lengths in bytes
+
+    def merge(self, other: "SubfieldStats") -> None:
+        self.occurrences += other.occurrences
+        self.repeats.merge(other.repeats)
+        self.lengths.merge(other.lengths)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "occurrences": self.occurrences,
+            "repeats": self.repeats.to_dict(),
+            "lengths": self.lengths.to_dict(),
+        }
+
+
+@dataclass
+class FieldStats:
+    """Statistics for one tag."""
+    occurrences: int = 0 # Total number of occurrences
+    repeats: Histogram = field(default_factory=lambda: Histogram(REPEAT_BUCKETS)) # Occurrences per record that has the tag
+    lengths: Histogram | None = None # Control field value lengths in bytes; None for data fields
+    indicators: Counter = field(default_factory=Counter) # Data field indicator pairs, e.g. "10"
+    subfields: dict[str, SubfieldStats] = field(default_factory=dict) # Data field subfields by code
+
+    def merge(self, other: "FieldStats") -> None:
+        self.occurrences += other.occurrences
+        self.repeats.merge(other.repeats)
+        if other.lengths is not None:
+            if self.lengths is None:
+                self.lengths = other.lengths
+            else:
+                self.lengths.merge(other.lengths)
+        self.indicators.update(other.indicators)
+        for code, subfield_stats in other.subfields.items():
+            if code in self.subfields:
+                self.subfields[code].merge(subfield_stats)
+            else:
+                self.subfields[code] = subfield_stats
+
+    def to_dict(self) -> dict[str, Any]:
+        result = {
+            "occurrences": self.occurrences,
+            "records": self.repeats.count,
+            "repeats": self.repeats.to_dict(),
+        }
+        if self.lengths is not None:
+            result["lengths"] = self.lengths.to_dict()
+        if self.indicators:
+            result["indicators"] = dict(self.indicators.most_common())
+        if self.subfields:
+            result["subfields"] = {
+                code: self.subfields[code].to_dict() for code in sorted(self.subfields)
+            }
+        return result
+
+
+@dataclass
+class DumpProfile:
+    """Tag, subfield, indicator and leader statistics of a MARC XML file."""
+    path: str # Path to the profiled file
+    record_count: int = 0 # Number of records
+    leader: array = field(default_factory=lambda: array("Q", bytes(8 * LEADER_LENGTH * 256))) # Byte counts per leader position
+    fields: dict[str, FieldStats] = field(default_factory=dict) # Field statistics by tag
+
+    def merge(self, other: "DumpProfile") -> None:
+        self.record_count += other.record_count
+        for i, count in enumerate(other.leader):
+            if count:
+                self.leader[i] += count
+        for tag, field_stats in other.fields.items():
+            if tag in self.fields:
+                self.fields[tag].merge(field_stats)
+            else:
+                self.fields[tag] = field_stats
+
+    def leader_values(self, position: int) -> dict[str, int]:
+        """Returns how often each value occurs at a leader position, most common first."""
+        counts = self.leader[position * 256 : (position + 1) * 256]
+        values = {chr(byte): count for byte, count in enumerate(counts) if count}
+        return dict(sorted(values.items(), key=lambda item: item[1], reverse=True))
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "path": self.path,
+            "records": self.record_count,
+            "leader": {position: self.leader_values(position) for position in range(LEADER_LENGTH)},
+            "fields": {tag: self.fields[tag].to_dict() for tag in sorted(self.fields)},
+        }
+
+    def __str__(self) -> str:
+        lines = [f"{self.path}: {self.record_count} records", "", "Leader"]
+        for position in range(LEADER_LENGTH):
+            values = "  ".join(
+                f"{value!r}: {count}" for value, count in list(self.leader_values(position).items())[:8]
+            )
+            lines.append(f"  {position:>2}  {values}")
+
+        lines += [
+            "",
+            f"{'Field':<8}{'Count':>10}{'Records':>10}{'Max/rec':>9}{'Max/field':>11}"
+            "  Length min/p50/p90/p99/max",
+        ]
+        for tag in sorted(self.fields):
+            field_stats = self.fields[tag]
+            lengths = field_stats.lengths
+            lines.append(
+                f"{tag:<8}{field_stats.occurrences:>10}{field_stats.repeats.count:>10}"
+                f"{field_stats.repeats.maximum:>9}{'':>11}  {format_lengths(lengths) if lengths else ''}".rstrip()
+            )
+            if field_stats.indicators:
+                indicators = "  ".join(
+                    f"{pair!r}: {count}" for pair, count in field_stats.indicators.most_common(8)
+                )
+                lines.append(f"  indicators  {indicators}")
+            for code in sorted(field_stats.subfields):
+                subfield_stats = field_stats.subfields[code]
+                lines.append(
+                    f"  ${code:<5}{subfield_stats.occurrences:>10}{'':>10}{'':>9}"
+                    f"{subfield_stats.repeats.maximum:>11}  {format_lengths(subfield_stats.lengths)}"
+                )
+        return "\n".join(lines)
+
+
+def format_lengths(lengths: Histogram) -> str:
+    return "/".join(
+        str(value)
+        for value in (
+            lengths.minimum,
+            lengths.percentile(50),
+            lengths.percentile(90),
+            lengths.percentile(99),
+            lengths.maximum,
+        )
+    )
+
+
+def value_length(value: bytes | None) -> int:
+    """Returns the length in bytes of a raw value once its entity references are resolved."""
+    if not value:
+        return 0
+    if b"&" not in value:
+        return len(value)
+    return len(html.unescape(value.decode("utf-8")).encode("utf-8"))
+
+
+def profile_shard(path: str, start: int, end: int) -> DumpProfile:
+    """Profiles the records starting in [start, end) of a file."""
+    dump_profile = DumpProfile(path=path)
+    fields = dump_profile.fields
+    # Leaders repeat heavily, so their bytes are counted once per distinct leader
+    leaders: dict[bytes, int] = {}
+
+    with open_dump(path) as buffer:
+        for offset, length in iter_record_spans(buffer, start, end):
+            dump_profile.record_count += 1
+            tag_counts: dict[str, int] = {}
+            # The data field whose subfields are being read, and their codes' counts
+            data_field_stats = None
+            code_counts: dict[str, int] = {}
+
+            for element, attrs, text in FIELD_ELEMENT.findall(buffer, offset, offset + length):
+                # A self-closing element is empty; the text after it isn't its value
+                self_closing = attrs.endswith(b"/")
+                if self_closing:
+                    text = b""
+                if element == b"subfield":
+                    if data_field_stats is None:
+                        continue
+                    code = subfield_code(attrs)
+                    if code is None:
+                        continue
+                    code_counts[code] = code_counts.get(code, 0) + 1
+                    subfield_stats = data_field_stats.subfields.get(code)
+                    if subfield_stats is None:
+                        subfield_stats = data_field_stats.subfields[code] = SubfieldStats()
+                    subfield_stats.occurrences += 1
+                    subfield_stats.lengths.add(value_length(text))
+                    continue
+
+                if code_counts:
+                    for code, count in code_counts.items():
+                        data_field_stats.subfields[code].repeats.add(count)
+                    code_counts.clear()
+                data_field_stats = None
+
+                if element == b"leader":
+                    leader = text[:LEADER_LENGTH]
+                    leaders[leader] = leaders.get(leader, 0) + 1
+                    continue
+
+                tag, ind1, ind2 = field_attributes(attrs)
+                if tag is None:
+                    continue
+                tag_counts[tag] = tag_counts.get(tag, 0) + 1
+                field_stats = fields.get(tag)
+                if field_stats is None:
+                    field_stats = fields[tag] = FieldStats()
+                field_stats.occurrences += 1
+
+                if element == b"controlfield":
+                    if field_stats.lengths is None:
+                        field_stats.lengths = Histogram(LENGTH_BUCKETS)
+                    field_stats.lengths.add(value_length(text))
+                else:
+                    field_stats.indicators[ind1 + ind2] += 1
+                    if not self_closing:
+                        data_field_stats = field_stats
+
+            for code, count in code_counts.items():
+                data_field_stats.subfields[code].repeats.add(count)
+            for tag, count in tag_counts.items():
+                fields[tag].repeats.add(count)
+
+    for leader, count in leaders.items():
+        for position, byte in enumerate(leader):
+            dump_profile.leader[position * 256 + byte] += count
+    return dump_profile
+
+
+def profile(path: os.PathLike | str, workers: int | None = 1) -> DumpProfile:
+    """
+    Collects tag, subfield, indicator and leader statistics of a MARC XML file.
+
+    The file is scanned over record-aligned shards without parsing it into MarcRecords,
+    and the partial results of the shards are merged.
+
+    Args:
+        path: The path to the MARC XML file.
+        workers: Optional; number of worker processes, or None for one per CPU. See `map_shards`.
+
+    Returns:
+        A DumpProfile with occurrence counts, per-record repeat histograms, value length
+        statistics, indicator combinations and leader position value counts.
+    """
+    dump_profile = DumpProfile(path=os.fspath(path))
+    for shard_profile in map_shards(path, profile_shard, workers):
+        dump_profile.merge(shard_profile)
+    return dump_profile
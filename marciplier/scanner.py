@@ -0,0 +1,246 @@
+import functools
+import html
+import mmap
+import os
+import re
+import xml.sax
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+from marciplier.converters.marc_xml import MarcXmlHandler
+from marciplier.marc_record import MarcRecord
+
+
+# Byte-level patterns for MARC XML. The element names may carry any namespace prefix
+# (e.g. "marc:record"), which is why the prefix is optional in every pattern.
+RECORD_START = re.compile(rb"<(?:[\w.-]+:)?record(?=[\s/>])")
+RECORD_END = re.compile(rb"</(?:[\w.-]+:)?record\s*>")
+LEADER = re.compile(
+    rb"<(?:[\w.-]+:)?leader\b[^>]*?(?:/>|>(.*?)</(?:[\w.-]+:)?leader\s*>)",
+    re.S,
+)
+# The start tag of a leader, field or subfield and the text after it, up to the next tag.
+# Elements are matched one start tag at a time instead of as a whole, which keeps the
+# scan linear; which subfields belong to which field follows from their order.
+FIELD_ELEMENT = re.compile(
+    rb"<(?:[\w.-]+:)?(leader|controlfield|datafield|subfield)\b([^>]*)>([^<]*)"
+)
+ATTRIBUTE = re.compile(rb"""([\w.:-]+)\s*=\s*(?:"([^"]*)"|'([^']*)')""")
+
+
+def decode_text(value: bytes | None) -> str:
+    """
+    Decodes the raw bytes of an element's text content.
+
+    Args:
+        value: The raw UTF-8 bytes between an element's start and end tags.
+
+    Returns:
+        The text with XML entity and character references resolved.
+    """
+    if not value:
+        return ""
+    text = value.decode("utf-8")
+    if "&" in text:
+        text = html.unescape(text)
+    return text
+
+
+def parse_attributes(attrs: bytes) -> dict[str, str]:
+    """
+    Parses the attribute part of a start tag.
+
+    Args:
+        attrs: The raw bytes between the element name and the closing '>'.
+
+    Returns:
+        A dictionary mapping attribute names to their decoded values.
+    """
+    return {
+        match[1].decode("ascii"): decode_text(match[2] if match[3] is None else match[3])
+        for match in ATTRIBUTE.finditer(attrs)
+    }
+
+
+@functools.lru_cache(maxsize=4096)
+def field_attributes(attrs: bytes) -> tuple[str | None, str, str]:
+    """
+    Returns the tag and indicators from the attribute part of a field's start tag.
+
+    The attribute strings of a dump repeat heavily, so the results are cached.
+    """
+    parsed = parse_attributes(attrs)
+    return parsed.get("tag"), parsed.get("ind1", " "), parsed.get("ind2", " ")
+
+
+@functools.lru_cache(maxsize=4096)
+def subfield_code(attrs: bytes) -> str | None:
+    """Returns the code from the attribute part of a subfield's start tag."""
+    return parse_attributes(attrs).get("code")
+
+
+def iter_fields(record: bytes) -> Iterator[tuple[str | None, tuple[str, str] | None, Any]]:
+    """
+    Yields the fields of a single MARC XML record without building a MarcRecord.
+
+    Control fields are yielded as (tag, None, value) and data fields as
+    (tag, (ind1, ind2), [(code, value), ...]). A missing tag or subfield code is
+    yielded as None.
+
+    Args:
+        record: The raw bytes of one record element.
+    """
+    data_field = None
+    for element, attrs, text in FIELD_ELEMENT.findall(record):
+        if element == b"subfield":
+            if data_field is not None:
+                # A self-closing subfield is empty; the text after it isn't its value
+                value = b"" if attrs.endswith(b"/") else text
+                data_field[2].append((subfield_code(attrs), decode_text(value)))
+            continue
+        if data_field is not None:
+            yield data_field
+            data_field = None
+        if element == b"controlfield":
+            tag = field_attributes(attrs)[0]
+            yield tag, None, decode_text(b"" if attrs.endswith(b"/") else text)
+        elif element == b"datafield":
+            tag, ind1, ind2 = field_attributes(attrs)
+            if attrs.endswith(b"/"):
+                yield tag, (ind1, ind2), []
+            else:
+                data_field = (tag, (ind1, ind2), [])
+    if data_field is not None:
+        yield data_field
+
+
+def read_leader(record: bytes) -> str | None:
+    """Returns the leader of a raw record, or None if the record has no leader."""
+    match = LEADER.search(record)
+    if match is None:
+        return None
+    return decode_text(match[1])
+
+
+def iter_record_spans(buffer: Any, start: int = 0, end: int | None = None) -> Iterator[tuple[int, int]]:
+    """
+    Yields the byte offset and length of every record element in a buffer.
+
+    Only records starting inside [start, end) are yielded, but a record is allowed to
+    end past `end`. Truncated records (a record start that is followed by another record
+    start before its end tag) are skipped.
+
+    Args:
+        buffer: A bytes-like object, typically an mmap of a MARC XML file.
+        start: Offset to start searching from.
+        end: Offset after which no new records are started. Defaults to the buffer end.
+    """
+    if end is None:
+        end = len(buffer)
+    position = start
+    while True:
+        record_start = RECORD_START.search(buffer, position, end)
+        if record_start is None:
+            return
+        offset = record_start.start()
+        record_end = RECORD_END.search(buffer, offset)
+        if record_end is None:
+            return
+        nested_start = RECORD_START.search(buffer, record_start.end(), record_end.start())
+        if nested_start is not None:
+            # The record was never closed; continue from the next record start
+            position = nested_start.start()
+            continue
+        position = record_end.end()
+        yield offset, position - offset
+
+
+@contextmanager
+def open_dump(path: os.PathLike | str) -> Iterator[Any]:
+    """
+    Memory-maps a MARC XML file for reading.
+
+    Args:
+        path: The path to the MARC XML file.
+
+    Yields:
+        A read-only mmap of the file, or an empty bytes object for an empty file.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            yield buffer
+
+
+def shard_boundaries(buffer: Any, shards: int) -> list[tuple[int, int]]:
+    """
+    Splits a buffer into ranges that each start on a record boundary.
+
+    Args:
+        buffer: A bytes-like object, typically an mmap of a MARC XML file.
+        shards: The desired number of ranges.
+
+    Returns:
+        A list of non-overlapping (start, end) ranges covering the buffer.
+    """
+    size = len(buffer)
+    boundaries = [0]
+    for i in range(1, shards):
+        match = RECORD_START.search(buffer, max(size * i // shards, boundaries[-1]))
+        if match is None:
+            break
+        if match.start() > boundaries[-1]:
+            boundaries.append(match.start())
+    boundaries.append(size)
+    return list(zip(boundaries, boundaries[1:]))
+
+
+def map_shards(
+    path: os.PathLike | str,
+    func: Callable[[str, int, int], Any],
+    workers: int | None = 1,
+) -> list[Any]:
+    """
+    Runs `func(path, start, end)` over record-aligned shards of a file.
+
+    Args:
+        path: The path to the MARC XML file.
+        func: A module-level function, so it can be sent to worker processes.
+        workers: Optional; number of worker processes, or None for one per CPU. Defaults
+                 to 1, which runs everything in the current process. Worker processes
+                 may import the caller's main module again, so it has to guard its
+                 top-level code with `if __name__ == "__main__":`.
+
+    Returns:
+        The results of `func`, in shard order.
+    """
+    path = os.fspath(path)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    with open_dump(path) as buffer:
+        shards = shard_boundaries(buffer, workers)
+
+    if workers == 1 or len(shards) == 1:
+        return [func(path, start, end) for start, end in shards]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(func, path, start, end) for start, end in shards]
+        return [future.result() for future in futures]
+
+
+def parse_record(record: bytes) -> MarcRecord:
+    """
+    Parses the raw bytes of a single record element into a MarcRecord.
+
+    Args:
+        record: The raw bytes of one record element, as located by `iter_record_spans`.
+
+    Returns:
+        The parsed MarcRecord.
+    """
+    content_handler = MarcXmlHandler()
+    xml.sax.parseString(record, content_handler)
+    return content_handler.marc_xml_state.records[0]
@@ -0,0 +1,258 @@
+import os
+import functools
+import re
+import shutil
+import sqlite3
+import tempfile
+from pathlib import Path
+
+from marciplier.marc_record import MarcRecord
+from marciplier.scanner import iter_fields, iter_record_spans, map_shards, open_dump, parse_record
+
+
+TOKEN = re.compile(r"\w+")
+CLAUSE = re.compile(r"^([A-Za-z0-9]{3}(?:\$[A-Za-z0-9])?):(.+)$", re.S)
+# A whitespace-separated part of a query; double quotes keep a multi-word value together
+QUERY_PART = re.compile(r'(?:[^\s"]+|"[^"]*")+')
+
+
+def tokenize(value: str) -> list[str]:
+    """Splits a field value into lowercase word tokens."""
+    return TOKEN.findall(value.casefold())
+
+
+def record_terms(record: bytes) -> tuple[str | None, set[str]]:
+    """
+    Collects the index terms of a raw record.
+
+    Control field terms look like "001:12345" and data field terms like
+    "700$a:tammsaare".
+
+    Args:
+        record: The raw bytes of one record element.
+
+    Returns:
+        The record's 001 value (or None) and the set of its terms.
+    """
+    control_number = None
+    terms = set()
+    for tag, indicators, content in iter_fields(record):
+        if indicators is None:
+            if tag == "001" and control_number is None:
+                control_number = content
+            terms.update(f"{tag}:{token}" for token in tokenize(content))
+        else:
+            for code, value in content:
+                terms.update(f"{tag}${code}:{token}" for token in tokenize(value))
+    return control_number, terms
+
+
+def create_tables(connection: sqlite3.Connection) -> None:
+    connection.executescript(
+        """
+        PRAGMA journal_mode = OFF;
+        PRAGMA synchronous = OFF;
+        CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE records (offset INTEGER PRIMARY KEY, length INTEGER, control_number TEXT);
+        CREATE TABLE postings (
+            term TEXT NOT NULL, offset INTEGER NOT NULL, PRIMARY KEY (term, offset)
+        ) WITHOUT ROWID;
+        """
+    )
+
+
+def index_shard(path: str, start: int, end: int, directory: str) -> str:
+    """
+    Indexes the records starting in [start, end) into a temporary SQLite file.
+
+    Args:
+        directory: The directory to create the shard's SQLite file in.
+
+    Returns:
+        The path to the shard's SQLite file.
+    """
+    fd, shard_path = tempfile.mkstemp(suffix=".shard", dir=directory)
+    os.close(fd)
+
+    connection = sqlite3.connect(shard_path)
+    create_tables(connection)
+    with open_dump(path) as buffer:
+        for offset, length in iter_record_spans(buffer, start, end):
+            control_number, terms = record_terms(buffer[offset : offset + length])
+            connection.execute(
+                "INSERT INTO records VALUES (?, ?, ?)", (offset, length, control_number)
+            )
+            connection.executemany(
+                "INSERT INTO postings VALUES (?, ?)", ((term, offset) for term in terms)
+            )
+    connection.commit()
+    connection.close()
+    return shard_path
+
+
+def build_search_index(
+    path: os.PathLike | str,
+    index_path: os.PathLike | str | None = None,
+    workers: int | None = 1,
+) -> Path:
+    """
+    Builds an on-disk inverted index over the subfield values of a MARC XML file.
+
+    The file is split into record-aligned shards that can be indexed in parallel and are
+    then merged into a single SQLite database. The index maps every token of every control
+    field and subfield value to the byte offsets of the records containing it.
+
+    Args:
+        path: The path to the MARC XML file.
+        index_path: Optional; where to write the index. Defaults to `<path>.index`.
+        workers: Optional; number of worker processes, or None for one per CPU. See `map_shards`.
+
+    Returns:
+        The path to the index file.
+    """
+    path = Path(path).resolve()
+    index_path = Path(index_path) if index_path else path.with_name(path.name + ".index")
+    if index_path.exists():
+        index_path.unlink()
+
+    stat = path.stat()
+    # The shard files of failed workers are removed along with the directory
+    shard_directory = tempfile.mkdtemp(suffix=".shards")
+    try:
+        shard_paths = map_shards(
+            path, functools.partial(index_shard, directory=shard_directory), workers
+        )
+
+        connection = sqlite3.connect(index_path)
+        create_tables(connection)
+        for shard_path in shard_paths:
+            connection.execute("ATTACH DATABASE ? AS shard", (shard_path,))
+            connection.execute("INSERT INTO records SELECT * FROM shard.records")
+            connection.execute("INSERT INTO postings SELECT * FROM shard.postings")
+            connection.commit()
+            connection.execute("DETACH DATABASE shard")
+            os.remove(shard_path)
+        # search() only accepts an index with meta rows, so they are written last
+        connection.executemany(
+            "INSERT INTO meta VALUES (?, ?)",
+            (
+                ("source", str(path)),
+                ("size", str(stat.st_size)),
+                ("mtime_ns", str(stat.st_mtime_ns)),
+            ),
+        )
+        connection.commit()
+        connection.close()
+    finally:
+        shutil.rmtree(shard_directory, ignore_errors=True)
+    return index_path
+
+
+def parse_query(query: str) -> list[list[str]]:
+    """
+    Parses a search query into OR-ed groups of AND-ed term patterns.
+
+    Clauses look like `700$a:tammsaare`, `700:tammsaare` (any subfield of the field) or
+    `001:12345`, and a trailing `*` turns the value into a prefix match. A value in
+    double quotes, like `245$a:"keisri hull"`, can hold several words, which must all
+    occur. Clauses are combined with AND and OR, AND binding tighter; adjacent clauses
+    without an operator are AND-ed.
+
+    Args:
+        query: The query string, e.g. "700$a:tammsaare AND 260$c:19*".
+
+    Returns:
+        A list of groups, each a list of SQLite GLOB patterns matching index terms.
+
+    Raises:
+        ValueError: If a clause is not of the form `<tag>[$<code>]:<value>`, or a quote
+                    is not closed.
+    """
+    if query.count('"') % 2:
+        raise ValueError(f"Search query has an unclosed quote: {query!r}")
+
+    groups = [[]]
+    for part in QUERY_PART.findall(query):
+        if part == "OR":
+            groups.append([])
+            continue
+        if part == "AND":
+            continue
+        match = CLAUSE.match(part.replace('"', ""))
+        if match is None:
+            raise ValueError(f"Invalid search clause: {part}")
+        field, value = match.groups()
+        if "$" not in field and not field.startswith("00"):
+            # Data field terms always carry a subfield code
+            field += "$?"
+        is_prefix = value.endswith("*")
+        tokens = tokenize(value)
+        if not tokens:
+            raise ValueError(f"Search clause has no searchable value: {part}")
+        # Tokens are word characters only, so they never contain GLOB wildcards.
+        # Only the last token of a value can be a prefix.
+        groups[-1].extend(f"{field}:{token}" for token in tokens)
+        if is_prefix:
+            groups[-1][-1] += "*"
+    if any(not group for group in groups):
+        raise ValueError(f"Invalid search query: {query!r}")
+    return groups
+
+
+def search(index: os.PathLike | str, query: str) -> list[MarcRecord]:
+    """
+    Searches an index built by `build_search_index`.
+
+    Args:
+        index: The path to the index file.
+        query: The query string, e.g. "700$a:tammsaare AND 260$c:19*". See `parse_query`.
+
+    Returns:
+        The matching records, in the order they appear in the source file.
+
+    Raises:
+        ValueError: If the index is incomplete, or the source file changed since the index
+                    was built.
+    """
+    groups = parse_query(query)
+    connection = sqlite3.connect(f"file:{Path(index).resolve()}?mode=ro", uri=True)
+    try:
+        meta = dict(connection.execute("SELECT key, value FROM meta"))
+        if "source" not in meta:
+            raise ValueError(
+                f"The index {index} is incomplete. Please rebuild it with build_search_index."
+            )
+        source = meta["source"]
+        stat = Path(source).stat()
+        if meta["size"] != str(stat.st_size) or meta["mtime_ns"] != str(stat.st_mtime_ns):
+            raise ValueError(
+                f"{source} changed since the index {index} was built. "
+                "Please rebuild it with build_search_index."
+            )
+
+        matches = set()
+        for group in groups:
+            group_matches = None
+            for pattern in group:
+                # SQLite turns the literal prefix of the pattern into a range scan of the
+                # term index
+                rows = connection.execute(
+                    "SELECT offset FROM postings WHERE term GLOB ?", (pattern,)
+                )
+                offsets = {row[0] for row in rows}
+                group_matches = offsets if group_matches is None else group_matches & offsets
+                if not group_matches:
+                    break
+            matches |= group_matches
+
+        spans = [
+            connection.execute(
+                "SELECT offset, length FROM records WHERE offset = ?", (offset,)
+            ).fetchone()
+            for offset in sorted(matches)
+        ]
+    finally:
+        connection.close()
+
+    with open_dump(source) as buffer:
+        return [parse_record(buffer[offset : offset + length]) for offset, length in spans]
@@ -0,0 +1,534 @@
+import functools
+import os
+import re
+from dataclasses import dataclass, field
+from xml.parsers import expat
+
+from marciplier.marc_record import NON_REPEATABLE_TAGS
+from marciplier.scanner import (
+    RECORD_END,
+    RECORD_START,
+    map_shards,
+    open_dump,
+    parse_attributes,
+)
+
+
+# Allowed values for each leader position; positions that aren't listed can hold anything
+LEADER_POSITIONS = {
+    **{position: b"0123456789" for position in range(0, 5)},
+    5: b"acdnp",
+    6: b"acdefgijkmoprtuvxyz",
+    7: b" abcdims",
+    8: b" a",
+    9: b" a",
+    10: b"2",
+    11: b"2",
+    **{position: b"0123456789" for position in range(12, 17)},
+    20: b"4",
+    21: b"5",
+    22: b"0",
+    23: b"0",
+}
+LEADER_FORMAT = re.compile(
+    rb"[0-9]{5}[acdnp][acdefgijkmoprtuvxyz][ abcdims][ a][ a]22[0-9]{5}...4500"
+)
+TAG_FORMAT = re.compile(r"[0-9A-Za-z]{3}")
+INDICATOR_FORMAT = re.compile(r"[0-9a-z ]")
+SUBFIELD_CODE_FORMAT = re.compile(r"[0-9a-z]")
+# A start or end tag and the text after it, up to the next tag. Captures whether it is
+# an end tag, its local name, its attributes and the text.
+ELEMENT = re.compile(rb"<(/?)(?:[\w.-]+:)?([\w.-]+)([^>]*)>([^<]*)")
+# The start tag of a record, leader, field or subfield and the text after it, followed by
+# the end tags and text up to the next start tag. Captures the local name, the attributes,
+# the text and the end tags with their text.
+MARC_ELEMENT = re.compile(
+    rb"<(?:[\w.-]+:)?(record|leader|controlfield|datafield|subfield)\b([^>]*)>([^<]*)"
+    rb"((?:</[^>]*>[^<]*)*)"
+)
+END_TAGS = re.compile(rb"(?:</[^>]*>\s*)*")
+# An '&' that doesn't start an entity or character reference
+UNESCAPED_AMPERSAND = re.compile(rb"&(?!(?:[A-Za-z_:][\w.:-]*|#[0-9]+|#x[0-9A-Fa-f]+);)")
+# Whitespace, comments and processing instructions, the only content allowed between records
+MISC = rb"(?:\s|<!--.*?-->|<\?.*?\?>)*"
+GAP = re.compile(MISC, re.S)
+# What may precede the first record: the XML declaration, a doctype and the collection
+# start tag, capturing the start tag and its qualified name
+PROLOG = re.compile(
+    rb"(?:\xef\xbb\xbf)?" + MISC + rb"(?:<!DOCTYPE[^>]*>" + MISC + rb")?"
+    rb"(?:(<((?:[\w.-]+:)?collection)\b[^>]*>)" + MISC + rb")?",
+    re.S,
+)
+# What may follow the last record, capturing the collection end tag and its qualified name
+EPILOGUE = re.compile(
+    MISC + rb"(?:(</((?:[\w.-]+:)?collection)\s*>)" + MISC + rb")?", re.S
+)
+
+
+@dataclass
+class ValidationIssue:
+    """A single problem found in a MARC XML file."""
+    offset: int # Byte offset of the offending element in the file
+    message: str # Description of the problem
+    control_number: str | None = None # 001 of the record, if it could be read
+
+    def __str__(self) -> str:
+        return f"{self.offset:>12}  {self.control_number or '-':<12}  {self.message}"
+
+
+@dataclass
+class ValidationReport:
+    """Result of validating a MARC XML file."""
+    path: str # Path to the validated file
+    record_count: int = 0 # Number of records checked
+    issue_count: int = 0 # Number of problems found, including ones not kept in `issues`
+    issues: list[ValidationIssue] = field(default_factory=list) # The first problems found, by offset
+
+    @property
+    def ok(self) -> bool:
+        return self.issue_count == 0
+
+    def __str__(self) -> str:
+        lines = [f"{self.path}: {self.record_count} records, {self.issue_count} issues"]
+        lines.extend(str(issue) for issue in self.issues)
+        if self.issue_count > len(self.issues):
+            lines.append(f"... {self.issue_count - len(self.issues)} more issues")
+        return "\n".join(lines)
+
+
+def check_leader(leader: bytes) -> list[str]:
+    """Returns a message for every problem in a leader's raw value."""
+    if len(leader) != 24:
+        return [f"leader has length {len(leader)}, expected 24"]
+    if LEADER_FORMAT.fullmatch(leader):
+        return []
+    return [
+        f"invalid leader position {position}: {leader[position:position + 1].decode('latin-1')!r}"
+        for position, allowed in LEADER_POSITIONS.items()
+        if leader[position] not in allowed
+    ]
+
+
+@functools.lru_cache(maxsize=4096)
+def check_field_attributes(element: bytes, attrs: bytes) -> tuple[str | None, tuple[str, ...]]:
+    """
+    Checks the tag and indicators in the attribute part of a field's start tag.
+
+    The attribute strings of a dump repeat heavily, so the results are cached.
+
+    Returns:
+        The field's tag (or None) and a message for every problem found.
+    """
+    try:
+        parsed = parse_attributes(attrs)
+    except UnicodeDecodeError:
+        return None, (f"{element.decode()} has attributes that are not valid UTF-8",)
+    tag = parsed.get("tag")
+    if tag is None:
+        return None, (f"{element.decode()} has no tag",)
+
+    problems = []
+    if not TAG_FORMAT.fullmatch(tag):
+        problems.append(f"invalid tag {tag!r}")
+    elif element == b"controlfield" and not tag.startswith("00"):
+        problems.append(f"control field has data field tag {tag}")
+    elif element == b"datafield" and tag.startswith("00"):
+        problems.append(f"data field has control field tag {tag}")
+
+    if element == b"datafield":
+        for name in ("ind1", "ind2"):
+            indicator = parsed.get(name)
+            if indicator is None:
+                problems.append(f"field {tag} has no {name}")
+            elif not INDICATOR_FORMAT.fullmatch(indicator):
+                problems.append(f"field {tag} has invalid {name} {indicator!r}")
+    return tag, tuple(problems)
+
+
+@functools.lru_cache(maxsize=4096)
+def check_subfield_attributes(attrs: bytes) -> str | None:
+    """Checks the code in the attribute part of a subfield's start tag."""
+    try:
+        code = parse_attributes(attrs).get("code")
+    except UnicodeDecodeError:
+        return "subfield has attributes that are not valid UTF-8"
+    if code is None:
+        return "subfield has no code"
+    if not SUBFIELD_CODE_FORMAT.fullmatch(code):
+        return f"invalid subfield code {code!r}"
+    return None
+
+
+@functools.lru_cache(maxsize=4096)
+def count_end_tags(end_tags: bytes) -> int | None:
+    """Counts the end tags captured by MARC_ELEMENT, or returns None if text is between them."""
+    if not END_TAGS.fullmatch(end_tags):
+        return None
+    return end_tags.count(b"<")
+
+
+def check_plain_record(record: bytes, offset: int) -> list[ValidationIssue] | None:
+    """
+    Checks the fields of a record that only contains well-formed MARC elements.
+
+    Most records are well-formed XML that contains nothing but a leader, fields and
+    subfields with whitespace between them. Their problems can be found from the start
+    tags alone, which is about twice as fast as looking at every tag.
+
+    Args:
+        record: The raw bytes of one record element.
+        offset: The byte offset of the record in the file.
+
+    Returns:
+        The problems found, in order of their offset, or None if the record contains
+        anything else.
+    """
+    problems: list[tuple[int, str]] = []
+    control_number = None
+    has_leader = False
+    tag_counts: dict[str, int] = {}
+    tag_count = depth = 0
+    # The last child of the record, where it and its tag start, and its subfield count
+    field_element = field_tag = None
+    field_index = subfield_count = 0
+
+    elements = MARC_ELEMENT.findall(record)
+    for index, (name, attrs, text, end_tags) in enumerate(elements):
+        end_tag_count = count_end_tags(end_tags)
+        if end_tag_count is None:
+            return None
+        tag_count += end_tag_count + 1
+        self_closing = attrs.endswith(b"/")
+
+        if name == b"subfield":
+            if depth != 2 or field_element != b"datafield":
+                return None
+            message = check_subfield_attributes(attrs)
+            if message is not None:
+                problems.append((index, f"field {field_tag}: {message}"))
+            subfield_count += 1
+        elif name == b"record":
+            if depth != 0 or text.strip():
+                return None
+        elif depth != 1:
+            return None
+        else:
+            if field_element == b"datafield" and subfield_count == 0:
+                problems.append((field_index, f"field {field_tag} has no subfields"))
+            field_element = name
+            subfield_count = 0
+            if name == b"leader":
+                has_leader = True
+                for message in check_leader(b"" if self_closing else text):
+                    problems.append((index, message))
+            else:
+                field_index = index
+                field_tag, messages = check_field_attributes(name, attrs)
+                for message in messages:
+                    problems.append((index, message))
+                if field_tag is not None:
+                    tag_counts[field_tag] = tag_counts.get(field_tag, 0) + 1
+                    if tag_counts[field_tag] == 2 and field_tag in NON_REPEATABLE_TAGS:
+                        message = f"non-repeatable field {field_tag} occurs more than once"
+                        problems.append((index, message))
+                if self_closing:
+                    field_element = None
+                    if name == b"datafield":
+                        problems.append((index, f"field {field_tag} has no subfields"))
+                elif name == b"datafield":
+                    if text.strip():
+                        return None
+                elif field_tag == "001" and control_number is None and text:
+                    control_number = text.decode("utf-8", "replace")
+
+        if self_closing:
+            # The text after a self-closing element isn't its value
+            if text.strip():
+                return None
+            depth -= end_tag_count
+        else:
+            depth += 1 - end_tag_count
+
+    if field_element == b"datafield" and subfield_count == 0:
+        problems.append((field_index, f"field {field_tag} has no subfields"))
+    # Comments, processing instructions and other elements have tags of their own
+    if record.count(b"<") != tag_count:
+        return None
+    parser = expat.ParserCreate()
+    try:
+        parser.Parse(record, True)
+    except expat.ExpatError:
+        return None
+
+    if problems:
+        starts = [match.start() for match in MARC_ELEMENT.finditer(record)]
+        problems = [(offset + starts[index], message) for index, message in problems]
+    if not has_leader:
+        problems.append((offset, "record has no leader"))
+    problems.sort(key=lambda problem: problem[0])
+    return [ValidationIssue(offset, message, control_number) for offset, message in problems]
+
+
+def check_record(record: bytes, offset: int) -> list[ValidationIssue]:
+    """
+    Checks the structure of a single record.
+
+    Records that `check_plain_record` can't check are checked one start and end tag at
+    a time.
+
+    Args:
+        record: The raw bytes of one record element.
+        offset: The byte offset of the record in the file.
+
+    Returns:
+        The problems found, in order of their offset.
+    """
+    issues = check_plain_record(record, offset)
+    if issues is not None:
+        return issues
+
+    problems: list[tuple[int, str]] = []
+    control_number = None
+    has_leader = False
+    # Problems that make the record fail the XML parser, which is then not run
+    malformed = False
+    tag_counts: dict[str, int] = {}
+    # The field that is open, and where it and its open subfield start
+    field_element = field_tag = None
+    field_offset = 0
+    subfield_offset = None
+    subfield_count = 0
+
+    # A single pass over the start and end tags: elements that never close show up as
+    # another start tag where the end tag should be
+    for match in ELEMENT.finditer(record):
+        closing, name, attrs, text = match.groups()
+        if closing:
+            if name == b"subfield":
+                subfield_offset = None
+            elif name == field_element:
+                if subfield_offset is not None:
+                    problems.append((subfield_offset, f"field {field_tag}: subfield is not closed"))
+                    subfield_offset = None
+                    malformed = True
+                elif name == b"datafield" and subfield_count == 0 and not malformed:
+                    problems.append((field_offset, f"field {field_tag} has no subfields"))
+                field_element = None
+                continue
+            if field_element == b"datafield" and text and not text.isspace():
+                message = f"field {field_tag} has text outside of subfields"
+                problems.append((offset + match.end(), message))
+                malformed = True
+            continue
+
+        self_closing = attrs.endswith(b"/")
+        if name == b"subfield":
+            if field_element != b"datafield":
+                if field_element is None:
+                    problems.append((offset + match.start(), "subfield is outside of a data field"))
+                else:
+                    problems.append((field_offset, f"field {field_tag} is not closed"))
+                malformed = True
+            elif subfield_offset is not None:
+                problems.append((subfield_offset, f"field {field_tag}: subfield is not closed"))
+                malformed = True
+            message = check_subfield_attributes(attrs)
+            if message is not None:
+                problems.append((offset + match.start(), f"field {field_tag}: {message}"))
+            subfield_count += 1
+            subfield_offset = None if self_closing else offset + match.start()
+            continue
+
+        if name in (b"controlfield", b"datafield"):
+            if field_element is not None:
+                problems.append((field_offset, f"field {field_tag} is not closed"))
+                malformed = True
+            field_offset = offset + match.start()
+            field_tag, messages = check_field_attributes(name, attrs)
+            problems.extend((field_offset, message) for message in messages)
+            if field_tag is not None:
+                tag_counts[field_tag] = tag_counts.get(field_tag, 0) + 1
+                if tag_counts[field_tag] == 2 and field_tag in NON_REPEATABLE_TAGS:
+                    problems.append(
+                        (field_offset, f"non-repeatable field {field_tag} occurs more than once")
+                    )
+            field_element = None if self_closing else name
+            subfield_offset = None
+            subfield_count = 0
+            if self_closing:
+                if name == b"datafield":
+                    problems.append((field_offset, f"field {field_tag} has no subfields"))
+            elif name == b"controlfield":
+                if field_tag == "001" and control_number is None and text:
+                    control_number = text.decode("utf-8", "replace")
+            elif text and not text.isspace():
+                message = f"field {field_tag} has text outside of subfields"
+                problems.append((offset + match.end(), message))
+                malformed = True
+        elif name == b"leader":
+            has_leader = True
+            for message in check_leader(b"" if self_closing else text):
+                problems.append((offset + match.start(), message))
+        elif field_element is not None:
+            element = name.decode("utf-8", "replace")
+            message = f"field {field_tag} has unexpected element {element}"
+            problems.append((offset + match.start(), message))
+            malformed = True
+
+    if not has_leader:
+        problems.append((offset, "record has no leader"))
+
+    if b"&" in record:
+        for ampersand in UNESCAPED_AMPERSAND.finditer(record):
+            problems.append((offset + ampersand.start(), "unescaped '&'"))
+            malformed = True
+
+    # Anything else the converter's XML parser would reject
+    if not malformed:
+        parser = expat.ParserCreate()
+        try:
+            parser.Parse(record, True)
+        except expat.ExpatError as error:
+            problems.append(
+                (
+                    offset + parser.ErrorByteIndex,
+                    f"record is not well-formed XML: {expat.ErrorString(error.code)}",
+                )
+            )
+
+    problems.sort(key=lambda problem: problem[0])
+    return [ValidationIssue(offset, message, control_number) for offset, message in problems]
+
+
+def check_prolog(prolog: bytes) -> list[ValidationIssue]:
+    """Checks the XML declaration and start tags before the first record with the XML parser."""
+    parser = expat.ParserCreate()
+    try:
+        parser.Parse(prolog, False)
+    except expat.ExpatError as error:
+        message = f"prolog is not well-formed XML: {expat.ErrorString(error.code)}"
+        return [ValidationIssue(parser.ErrorByteIndex, message)]
+    except LookupError as error:
+        return [ValidationIssue(0, f"prolog declares an {error}")]
+    return []
+
+
+def validate_shard(
+    path: str, start: int, end: int, max_issues: int | None = 1000
+) -> ValidationReport:
+    """
+    Validates the records starting in [start, end) of a file.
+
+    The content between the records is checked too, the prolog by the first shard and
+    the end of the collection by the last one.
+    """
+    report = ValidationReport(path=path)
+
+    def add_issues(issues: list[ValidationIssue]) -> None:
+        report.issue_count += len(issues)
+        if max_issues is None:
+            report.issues.extend(issues)
+        else:
+            report.issues.extend(issues[: max(max_issues - len(report.issues), 0)])
+
+    def check_gap(gap_end: int) -> None:
+        gap = GAP.match(buffer, position, gap_end)
+        first = not report.record_count and not start
+        if gap.end() != gap_end:
+            if first:
+                message = "unexpected content before the first record"
+            else:
+                message = "unexpected content between records"
+            add_issues([ValidationIssue(gap.end(), message)])
+        elif first:
+            # With the '<' of the first record, an attribute value left open in the
+            # collection start tag is an error instead of incomplete input
+            add_issues(check_prolog(buffer[: gap_end + 1]))
+
+    with open_dump(path) as buffer:
+        size = len(buffer)
+        # The prolog is short, so every shard reads it to know if the records have a
+        # collection element around them
+        prolog = PROLOG.match(buffer)
+        collection = prolog[1] is not None and not prolog[1].endswith(b"/>")
+        position = prolog.end() if start == 0 else start
+        while True:
+            record_start = RECORD_START.search(buffer, position, end)
+            if record_start is None:
+                break
+            offset = record_start.start()
+            check_gap(offset)
+            if not collection and (report.record_count or start):
+                add_issues([ValidationIssue(offset, "record is outside of the collection")])
+            report.record_count += 1
+
+            record_end = RECORD_END.search(buffer, offset)
+            nested_start = RECORD_START.search(
+                buffer, record_start.end(), record_end.start() if record_end else size
+            )
+            if nested_start is not None or record_end is None:
+                add_issues([ValidationIssue(offset, "record is not closed")])
+                if nested_start is None:
+                    position = size
+                    break
+                position = nested_start.start()
+                continue
+
+            position = record_end.end()
+            add_issues(check_record(buffer[offset:position], offset))
+
+        if end < size:
+            if position < end:
+                check_gap(end)
+            return report
+
+        epilogue = EPILOGUE.match(buffer, position)
+        if epilogue.end() != size:
+            message = "unexpected content after the last record"
+            add_issues([ValidationIssue(epilogue.end(), message)])
+        elif epilogue[1] is not None and not collection:
+            add_issues([ValidationIssue(epilogue.start(1), "unexpected collection end tag")])
+        elif collection and epilogue[1] is None:
+            add_issues([ValidationIssue(size, "collection is not closed")])
+        elif collection and epilogue[2] != prolog[2]:
+            message = "collection end tag doesn't match its start tag"
+            add_issues([ValidationIssue(epilogue.start(1), message)])
+        elif not collection and not report.record_count and not start:
+            add_issues([ValidationIssue(0, "file has no collection or record element")])
+    return report
+
+
+def validate(
+    path: os.PathLike | str, workers: int | None = 1, max_issues: int | None = 1000
+) -> ValidationReport:
+    """
+    Checks the structure of a MARC XML file in a single streaming pass.
+
+    Checks that every record is well-formed XML with closed fields and subfields and a
+    valid 24 character leader, that tags, indicators and subfield codes are well-formed,
+    and that non-repeatable fields occur at most once per record. Outside of the records,
+    only the prolog, the collection tags, whitespace and comments are allowed. The file
+    is checked over record-aligned shards without parsing it into MarcRecords, so it is
+    cheap enough to run before every conversion.
+
+    Args:
+        path: The path to the MARC XML file.
+        workers: Optional; number of worker processes, or None for one per CPU. See `map_shards`.
+        max_issues: Optional; number of issues to keep in the report. All issues are
+                    still counted. None keeps every issue.
+
+    Returns:
+        A ValidationReport; `report.ok` is True if no problems were found.
+    """
+    shard_reports = map_shards(
+        path, functools.partial(validate_shard, max_issues=max_issues), workers
+    )
+
+    report = ValidationReport(path=os.fspath(path))
+    for shard_report in shard_reports:
+        report.record_count += shard_report.record_count
+        report.issue_count += shard_report.issue_count
+        report.issues.extend(shard_report.issues)
+    if max_issues is not None:
+        del report.issues[max_issues:]
+    return report
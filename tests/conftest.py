@@ -0,0 +1,40 @@
+from pathlib import Path
+
+import pytest
+
+from tests.helpers import collection_xml, record_xml
+
+
+@pytest.fixture
+def write_dump(tmp_path):
+    """Returns a function that writes records to a MARC XML file and returns its path."""
+    counter = 0
+
+    def write(records: list[str], name: str | None = None) -> Path:
+        nonlocal counter
+        counter += 1
+        path = tmp_path / (name or f"dump{counter}.xml")
+        path.write_text(collection_xml(records), encoding="utf-8")
+        return path
+
+    return write
+
+
+@pytest.fixture
+def sample_dump(write_dump):
+    """A dump of 40 varied records, a few of them invalid, large enough to split into shards."""
+    authors = ["Tammsaare, A. H.", "Kross, Jaan", "Under, Marie", "Vilde, Eduard"]
+    records = []
+    for i in range(40):
+        datafields = [
+            ("245", "10", [("a", f"Raamat number {i} & lisa"), ("c", authors[i % 4])]),
+            ("260", "  ", [("a", "Tallinn"), ("c", f"{1900 + i * 3}.")]),
+        ]
+        datafields += [("700", "1 ", [("a", authors[(i + j) % 4])]) for j in range(i % 3)]
+        if i % 13 == 5:
+            datafields.append(("245", "10", [("a", "Duplicate title")]))
+        leader = "00000nam a2200000 i 4500" if i % 17 else "00000nam a220000 i 4500"
+        records.append(
+            record_xml(leader=leader, controlfields=[("001", str(i))], datafields=datafields)
+        )
+    return write_dump(records)
@@ -0,0 +1,38 @@
+from xml.sax.saxutils import escape, quoteattr
+
+
+def record_xml(
+    leader: str = "00000nam a2200000 i 4500",
+    controlfields: list[tuple[str, str]] = (),
+    datafields: list[tuple[str, str, list[tuple[str, str]]]] = (),
+) -> str:
+    """
+    Builds a MARC XML record element.
+
+    Args:
+        leader: The leader value.
+        controlfields: (tag, value) pairs.
+        datafields: (tag, indicators, [(code, value), ...]) tuples, indicators as a two
+                    character string.
+    """
+    lines = ["<marc:record>", f"<marc:leader>{escape(leader)}</marc:leader>"]
+    for tag, value in controlfields:
+        lines.append(f'<marc:controlfield tag="{tag}">{escape(value)}</marc:controlfield>')
+    for tag, indicators, subfields in datafields:
+        lines.append(
+            f'<marc:datafield tag="{tag}" ind1={quoteattr(indicators[0])} ind2={quoteattr(indicators[1])}>'
+        )
+        for code, value in subfields:
+            lines.append(f'<marc:subfield code="{code}">{escape(value)}</marc:subfield>')
+        lines.append("</marc:datafield>")
+    lines.append("</marc:record>")
+    return "\n".join(lines)
+
+
+def collection_xml(records: list[str]) -> str:
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<marc:collection xmlns:marc="http://www.loc.gov/MARC21/slim">\n'
+        + "\n".join(records)
+        + "\n</marc:collection>\n"
+    )
@@ -0,0 +1,55 @@
+import io
+import json
+
+import pytest
+
+from marciplier.converters import marc_json
+from marciplier.converters.marc_json import write_json
+from marciplier.converters.marc_xml import MarcXmlConversionStrategy
+
+
+@pytest.fixture
+def records(sample_dump):
+    return MarcXmlConversionStrategy().to_records(str(sample_dump))
+
+
+def as_json(records) -> list[dict]:
+    """The records as the standard library round-trips them, with tuples as lists."""
+    return json.loads(json.dumps([record.to_dict() for record in records]))
+
+
+def test_backends_write_identical_output(records, monkeypatch):
+    pytest.importorskip("orjson")
+    with_orjson = io.BytesIO()
+    write_json(records, with_orjson)
+    monkeypatch.setattr(marc_json, "orjson", None)
+    with_stdlib = io.BytesIO()
+    write_json(records, with_stdlib)
+
+    assert with_orjson.getvalue() == with_stdlib.getvalue()
+    assert json.loads(with_stdlib.getvalue()) == as_json(records)
+
+
+def test_ndjson(records):
+    f = io.BytesIO()
+
+    assert write_json(records, f, ndjson=True, buffer_size=100) == len(records)
+    lines = f.getvalue().decode("utf-8").splitlines()
+    assert [json.loads(line) for line in lines] == as_json(records)
+
+
+def test_empty_input():
+    array, lines = io.BytesIO(), io.BytesIO()
+
+    assert write_json([], array) == 0
+    assert write_json([], lines, ndjson=True) == 0
+    assert array.getvalue() == b"[]"
+    assert lines.getvalue() == b""
+
+
+def test_text_and_binary_files_get_the_same_output(records):
+    binary, text = io.BytesIO(), io.StringIO()
+    write_json(records, binary, buffer_size=100)
+    write_json(records, text, buffer_size=100)
+
+    assert text.getvalue() == binary.getvalue().decode("utf-8")
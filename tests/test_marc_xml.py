@@ -0,0 +1,31 @@
+from marciplier.converters.marc_xml import MarcXmlConversionStrategy
+from tests.helpers import record_xml
+
+
+def test_iter_records_matches_to_records(sample_dump):
+    strategy = MarcXmlConversionStrategy()
+    expected = [record.to_dict() for record in strategy.to_records(str(sample_dump))]
+
+    records = strategy.iter_records(sample_dump, chunk_size=7)
+    assert [record.to_dict() for record in records] == expected
+    with open(sample_dump, "rb") as f:
+        assert [record.to_dict() for record in strategy.iter_records(f)] == expected
+
+
+def test_values_split_at_whitespace_are_kept_whole(write_dump):
+    path = write_dump(
+        [
+            record_xml(
+                controlfields=[("001", "1")],
+                datafields=[("100", "1 ", [("a", "Tammsaare, A. H."), ("d", "1878 - 1940")])],
+            )
+        ]
+    )
+
+    # Feeding one byte at a time makes the parser report every space as its own chunk
+    (record,) = MarcXmlConversionStrategy().iter_records(path, chunk_size=1)
+
+    assert [subfield.values for subfield in record.get_data_field("100")[0].subfields] == [
+        ["Tammsaare, A. H."],
+        ["1878 - 1940"],
+    ]
@@ -0,0 +1,103 @@
+from marciplier.merge import MergePolicy, merge_records
+from tests.helpers import record_xml
+
+
+def test_blank_keys_are_not_merged(write_dump):
+    path = write_dump(
+        [
+            record_xml(controlfields=[("001", "")], datafields=[("245", "10", [("a", "A")])]),
+            record_xml(controlfields=[("001", "")], datafields=[("245", "10", [("a", "B")])]),
+            record_xml(controlfields=[("001", "  ")], datafields=[("245", "10", [("a", "C")])]),
+            record_xml(controlfields=[("001", "  ")], datafields=[("245", "10", [("a", "D")])]),
+        ]
+    )
+
+    records = list(merge_records([path], policy=MergePolicy(data_fields="preferred")))
+
+    titles = [record.get_data_field("245")[0].get_subfield("a").values for record in records]
+    assert titles == [["A"], ["B"], ["C"], ["D"]]
+
+
+def make_record(control_number: str, version: str, title: str, subjects: list[str]) -> str:
+    return record_xml(
+        controlfields=[("001", control_number), ("005", version)],
+        datafields=[("245", "10", [("a", title)])]
+        + [("650", " 4", [("a", subject)]) for subject in subjects],
+    )
+
+
+def summarize(records) -> list[tuple]:
+    return [
+        (
+            record.get_control_field("001").values,
+            record.get_control_field("005").values,
+            [field.get_subfield("a").values for field in record.data_fields],
+        )
+        for record in records
+    ]
+
+
+def test_spilled_index_gives_same_output(write_dump):
+    first = write_dump(
+        [make_record(str(i % 7), f"2020010{i % 3}", f"T{i}", [f"S{i}"]) for i in range(30)]
+    )
+    second = write_dump(
+        [make_record(str(i % 11), f"2021010{i % 2}", f"U{i}", [f"S{i}"]) for i in range(20)]
+    )
+
+    in_memory = summarize(merge_records([first, second]))
+    spilled = summarize(merge_records([first, second], max_keys_in_memory=3))
+
+    assert spilled == in_memory
+    assert [record[0] for record in in_memory] == [[str(i)] for i in range(11)]
+
+
+def test_merge_policies(write_dump):
+    path = write_dump(
+        [
+            make_record("1", "20200101", "Old", ["A"]),
+            make_record("1", "20220101", "New", ["B"]),
+            make_record("1", "20210101", "Middle", ["A", "C"]),
+        ]
+    )
+
+    newest, = summarize(merge_records([path], policy=MergePolicy(prefer="newest")))
+    first, = summarize(merge_records([path], policy=MergePolicy(prefer="first")))
+    last, = summarize(
+        merge_records([path], policy=MergePolicy(prefer="last", data_fields="preferred"))
+    )
+
+    # The preferred record keeps its fields; distinct repeatable data fields of the others
+    # are appended, but the non-repeatable 245 only comes from the preferred record
+    assert newest == (["1"], ["20220101"], [["New"], ["B"], ["A"], ["C"]])
+    assert first == (["1"], ["20200101"], [["Old"], ["A"], ["B"], ["C"]])
+    assert last == (["1"], ["20210101"], [["Middle"], ["A"], ["C"]])
+
+
+def test_union_keeps_non_repeatable_fields_of_preferred_record(write_dump):
+    def author_record(version: str, author: str, title: str, contributor: str) -> str:
+        return record_xml(
+            controlfields=[("001", "1"), ("005", version)],
+            datafields=[
+                ("100", "1 ", [("a", author)]),
+                ("245", "10", [("a", title)]),
+                ("700", "1 ", [("a", contributor)]),
+            ],
+        )
+
+    path = write_dump(
+        [
+            author_record("20200101", "Tammsaare, A. H.", "Tõde ja õigus", "Under, Marie"),
+            author_record("20220101", "Tammsaare, Anton Hansen", "Tõde ja õigus I", "Kross, Jaan"),
+        ]
+    )
+
+    merged, = merge_records([path])
+
+    assert [field.tag for field in merged.data_fields] == ["100", "245", "700", "700"]
+    assert [field.get_subfield("a").values for field in merged.data_fields] == [
+        ["Tammsaare, Anton Hansen"],
+        ["Tõde ja õigus I"],
+        ["Kross, Jaan"],
+        ["Under, Marie"],
+    ]
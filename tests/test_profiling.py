@@ -0,0 +1,63 @@
+from marciplier.profiling import Histogram, profile
+from tests.helpers import record_xml
+
+
+def test_histogram_statistics_above_exact_range():
+    histogram = Histogram(1024)
+    for value in (2000, 3000, 5000):
+        histogram.add(value)
+
+    statistics = histogram.to_dict()
+
+    assert statistics["min"] == 2000
+    assert statistics["max"] == 5000
+    # Percentiles above the exact range are bucket upper bounds, within 1/8 of the value
+    assert 3000 <= statistics["p50"] <= 3000 * 9 / 8
+    assert statistics["p90"] == statistics["p99"] == 5000
+
+
+def test_histogram_merge():
+    left, right, combined = Histogram(64), Histogram(64), Histogram(64)
+    for i, value in enumerate((1, 63, 64, 100, 7, 10_000)):
+        (left if i % 2 else right).add(value)
+        combined.add(value)
+
+    left.merge(right)
+
+    assert left.counts == combined.counts
+    assert left.to_dict() == combined.to_dict()
+
+
+def test_profile_is_independent_of_shards(sample_dump):
+    single = profile(sample_dump, workers=1).to_dict()
+    sharded = profile(sample_dump, workers=3).to_dict()
+
+    assert single["records"] == 40
+    assert single["fields"]["700"]["occurrences"] == 39
+    assert single["fields"]["700"]["records"] == 26
+    assert single["fields"]["001"]["lengths"]["max"] == 2
+    assert "lengths" not in single["fields"]["700"]
+    assert sharded == single
+
+
+def test_self_closing_elements_are_empty(write_dump):
+    record = (
+        record_xml(
+            controlfields=[("001", "1")],
+            datafields=[("245", "10", [("a", "Title"), ("b", "")]), ("504", "  ", [("a", "Note")])],
+        )
+        .replace('<marc:subfield code="b"></marc:subfield>', '<marc:subfield code="b"/>')
+        .replace(
+            '<marc:datafield tag="504"',
+            '<marc:datafield tag="500" ind1=" " ind2=" "/><marc:datafield tag="504"',
+        )
+    )
+    path = write_dump([record])
+
+    fields = profile(path, workers=1).to_dict()["fields"]
+
+    assert fields["245"]["subfields"]["a"]["lengths"]["max"] == 5
+    assert fields["245"]["subfields"]["b"]["lengths"]["max"] == 0
+    assert fields["500"]["indicators"] == {"  ": 1}
+    assert "a" not in fields["500"].get("subfields", {})
+    assert fields["504"]["subfields"]["a"]["occurrences"] == 1
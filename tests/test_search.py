@@ -0,0 +1,112 @@
+import re
+import sqlite3
+
+import pytest
+
+from marciplier.converter import convert
+from marciplier.scanner import open_dump, shard_boundaries
+from marciplier.search import build_search_index, parse_query, search
+
+
+def control_numbers(records) -> list[str]:
+    return [record.get_control_field("001").values[0] for record in records]
+
+
+def subfield_words(record, tag: str, code: str) -> set[str]:
+    return {
+        word
+        for field in record.get_data_field(tag)
+        for subfield in field.subfields
+        if subfield.code == code
+        for value in subfield.values
+        for word in re.findall(r"\w+", value.casefold())
+    }
+
+
+def test_search_matches_full_scan(sample_dump):
+    records = convert(sample_dump, src_format="xml", target_format="records")
+    index = build_search_index(sample_dump, workers=1)
+
+    expected = [
+        record
+        for record in records
+        if "tammsaare" in subfield_words(record, "700", "a")
+        and any(word.startswith("19") for word in subfield_words(record, "260", "c"))
+    ]
+    assert expected
+    assert control_numbers(search(index, "700$a:tammsaare AND 260$c:19*")) == control_numbers(expected)
+
+    assert control_numbers(search(index, "001:7 OR 001:8")) == ["7", "8"]
+
+    expected = [
+        record
+        for record in records
+        if "under" in subfield_words(record, "245", "c")
+        and any(word.startswith("1") for word in subfield_words(record, "245", "a"))
+    ]
+    assert expected
+    assert control_numbers(search(index, "245$c:under 245$a:1*")) == control_numbers(expected)
+
+
+def test_field_clauses_and_quoted_values(sample_dump):
+    records = convert(sample_dump, src_format="xml", target_format="records")
+    index = build_search_index(sample_dump, workers=1)
+
+    expected = [
+        record
+        for record in records
+        if "kross" in subfield_words(record, "245", "a") | subfield_words(record, "245", "c")
+    ]
+    assert expected
+    assert control_numbers(search(index, "245:kross")) == control_numbers(expected)
+    assert control_numbers(search(index, "700:tamm*")) == control_numbers(
+        search(index, "700$a:tammsaare")
+    )
+
+    assert control_numbers(search(index, '245$a:"number 7"')) == ["7"]
+    assert control_numbers(search(index, '245$a:"number 7" OR 001:8')) == ["7", "8"]
+
+
+def test_parse_query():
+    assert parse_query('700:tammsaare AND 245$a:"keisri hull*" OR 001:1') == [
+        ["700$?:tammsaare", "245$a:keisri", "245$a:hull*"],
+        ["001:1"],
+    ]
+    with pytest.raises(ValueError):
+        parse_query('245$a:"keisri hull')
+    with pytest.raises(ValueError):
+        parse_query("tammsaare")
+
+
+def test_search_is_independent_of_shards(sample_dump, tmp_path):
+    with open_dump(sample_dump) as buffer:
+        assert len(shard_boundaries(buffer, 3)) == 3
+
+    single = build_search_index(sample_dump, tmp_path / "single.index", workers=1)
+    sharded = build_search_index(sample_dump, tmp_path / "sharded.index", workers=3)
+
+    for query in ("700$a:tammsaare AND 260$c:19*", "245$a:lisa", "001:39 OR 245$a:raamat"):
+        assert [record.to_dict() for record in search(sharded, query)] == [
+            record.to_dict() for record in search(single, query)
+        ]
+
+
+def test_stale_index_is_rejected(sample_dump):
+    index = build_search_index(sample_dump, workers=1)
+    with open(sample_dump, "a") as f:
+        f.write("\n")
+
+    with pytest.raises(ValueError, match="rebuild"):
+        search(index, "245$a:lisa")
+
+
+def test_incomplete_index_is_rejected(sample_dump):
+    index = build_search_index(sample_dump, workers=1)
+    # An interrupted build leaves the meta rows unwritten
+    connection = sqlite3.connect(index)
+    connection.execute("DELETE FROM meta")
+    connection.commit()
+    connection.close()
+
+    with pytest.raises(ValueError, match="incomplete"):
+        search(index, "245$a:lisa")
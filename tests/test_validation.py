@@ -0,0 +1,155 @@
+from marciplier.validation import validate
+from tests.helpers import record_xml
+
+
+def test_repeated_edition_statement_is_valid(write_dump):
+    path = write_dump(
+        [
+            record_xml(
+                controlfields=[("001", "1")],
+                datafields=[
+                    ("245", "10", [("a", "Title")]),
+                    ("250", "  ", [("a", "2nd ed.")]),
+                    ("250", "  ", [("a", "Revised")]),
+                ],
+            )
+        ]
+    )
+
+    assert validate(path, workers=1).ok
+
+
+def test_repeated_title_statement_is_reported(write_dump):
+    path = write_dump(
+        [
+            record_xml(
+                controlfields=[("001", "1")],
+                datafields=[("245", "10", [("a", "One")]), ("245", "10", [("a", "Two")])],
+            )
+        ]
+    )
+
+    report = validate(path, workers=1)
+
+    assert [issue.message for issue in report.issues] == [
+        "non-repeatable field 245 occurs more than once"
+    ]
+
+
+def test_malformed_records_are_reported(write_dump):
+    author = record_xml(
+        controlfields=[("001", "1")],
+        datafields=[("100", "1 ", [("a", "Tammsaare, A. H."), ("d", "1878-1940")])],
+    )
+    unclosed_subfield = author.replace("1878-1940</marc:subfield>", "1878-1940")
+    unescaped_ampersand = record_xml(
+        controlfields=[("001", "2")], datafields=[("245", "10", [("a", "T&Co")])]
+    ).replace("T&amp;Co", "T&Co")
+    unclosed_field = author.replace("</marc:datafield>", "")
+    path = write_dump([unclosed_subfield, unescaped_ampersand, unclosed_field])
+
+    report = validate(path, workers=1)
+
+    assert [issue.message for issue in report.issues] == [
+        "field 100: subfield is not closed",
+        "unescaped '&'",
+        "record is not well-formed XML: mismatched tag",
+    ]
+    data = path.read_bytes()
+    assert data[report.issues[0].offset :].startswith(b'<marc:subfield code="d">')
+    assert data[report.issues[1].offset :].startswith(b"&Co")
+
+
+def test_records_with_other_markup_are_checked_tag_by_tag(write_dump):
+    titles = record_xml(
+        controlfields=[("001", "1")],
+        datafields=[("245", "10", [("a", "One")]), ("245", "10", [("a", "Two")])],
+    )
+    commented = titles.replace("<marc:datafield", "<!-- note -->\n<marc:datafield", 1)
+    nested = record_xml(
+        controlfields=[("001", "2")], datafields=[("245", "10", [("a", "One")])]
+    ).replace(
+        "</marc:datafield>",
+        '<marc:controlfield tag="005">20200101</marc:controlfield></marc:datafield>',
+    )
+    path = write_dump([titles, commented, nested])
+
+    report = validate(path, workers=1)
+
+    assert [(issue.control_number, issue.message) for issue in report.issues] == [
+        ("1", "non-repeatable field 245 occurs more than once"),
+        ("1", "non-repeatable field 245 occurs more than once"),
+        ("2", "field 245 is not closed"),
+    ]
+
+
+def test_attributes_that_are_not_utf8_are_reported(write_dump):
+    path = write_dump(
+        [record_xml(controlfields=[("001", "1")], datafields=[("245", "10", [("a", "Title")])])]
+    )
+    path.write_bytes(path.read_bytes().replace(b'code="a"', b'code="\xb5"'))
+
+    report = validate(path, workers=1)
+
+    assert [issue.message for issue in report.issues] == [
+        "field 245: subfield has attributes that are not valid UTF-8",
+        "record is not well-formed XML: not well-formed (invalid token)",
+    ]
+
+
+def test_validation_is_independent_of_shards(sample_dump):
+    single = validate(sample_dump, workers=1)
+    sharded = validate(sample_dump, workers=3)
+
+    assert single.record_count == 40
+    assert not single.ok
+    assert sharded == single
+
+
+def test_content_outside_of_records_is_reported(write_dump):
+    records = [record_xml(controlfields=[("001", str(i))]) for i in range(3)]
+    path = write_dump(records)
+    text = path.read_text(encoding="utf-8")
+
+    def issues(text: str) -> list[tuple[str, str]]:
+        path.write_text(text, encoding="utf-8")
+        data = path.read_bytes()
+        return [
+            (issue.message, data[issue.offset : issue.offset + 6].decode())
+            for issue in validate(path, workers=1).issues
+        ]
+
+    assert issues(text) == []
+    assert issues(text.replace("</marc:collection>", "")) == [("collection is not closed", "")]
+    assert issues(text.replace("</marc:record>\n", "</marc:record>\n<oops & ", 1)) == [
+        ("unexpected content between records", "<oops ")
+    ]
+    assert issues(text.replace("<marc:record>", "oops<marc:record>", 1)) == [
+        ("unexpected content before the first record", "oops<m")
+    ]
+    assert issues(text + "oops") == [("unexpected content after the last record", "oops")]
+    assert issues(text.replace('encoding="UTF-8"', 'encoding="UTF-8"&')) == [
+        ("prolog is not well-formed XML: XML declaration not well-formed", "&?>\n<m")
+    ]
+    assert issues(text.replace("</marc:collection>", "</collection>")) == [
+        ("collection end tag doesn't match its start tag", "</coll")
+    ]
+    assert issues(text.replace("<marc:collection", "<!-- start -->\n<marc:collection")) == []
+    assert issues(records[0]) == []
+    assert issues("\n".join(records)) == [("record is outside of the collection", "<marc:")] * 2
+
+
+def test_content_outside_of_records_is_independent_of_shards(write_dump):
+    records = [record_xml(controlfields=[("001", str(i))]) for i in range(30)]
+    path = write_dump(records)
+    text = path.read_text(encoding="utf-8")
+    path.write_text(
+        text.replace("</marc:record>\n", "</marc:record>\n<oops & ").replace("</marc:collection>", ""),
+        encoding="utf-8",
+    )
+
+    single = validate(path, workers=1)
+    sharded = validate(path, workers=3)
+
+    assert single.issue_count == 30
+    assert sharded == single